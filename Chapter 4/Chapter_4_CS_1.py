@@ -22,7 +22,8 @@
 #
 # Software Dependencies:
 #   - Python 3.8+
-#   - pypsa (v0.21+ recommended)
+#   - pypsa (v0.31+, including 1.x; linopy backend)
+#   - highspy (HiGHS LP solver)
 #   - numpy, pandas, matplotlib
 #
 # License: MIT
@@ -31,10 +32,28 @@
 # Date: June 2025
 # ==============================================================================
 
+import os
+import itertools
 import pypsa
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
+import highspy  # noqa: F401  (fail fast if the HiGHS solver is not installed)
+
+# Headless mode (HEADLESS=1): render off-screen with Agg and save figures to PNG
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+if HEADLESS:
+    matplotlib.use("Agg")
+_figure_ids = itertools.count(1)
+
+def show_figure():
+    # Show the current figure, or save and close it when running headless
+    if HEADLESS:
+        plt.savefig(f"chapter_4_cs_1_fig_{next(_figure_ids)}.png", dpi=100)
+        plt.close()
+    else:
+        plt.show()
 
 # ---------------------
 # Step 1: Network Setup
@@ -76,24 +95,29 @@ network.set_snapshots(hours)
 # Step 3: Assign Time Series (Availability)
 # ----------------------------------------
 # Synthetic solar profile: sinusoidal, peaks at midday
+# (computed in place in one preallocated buffer)
 angle_range = np.linspace(-np.pi/2, 3*np.pi/2, len(hours))
-solar_output = np.maximum(0, np.sin(angle_range))  # [0, 1]
+solar_output = np.empty(len(hours))
+np.sin(angle_range, out=solar_output)
+np.maximum(solar_output, 0.0, out=solar_output)  # [0, 1]
 
 # Synthetic wind profile: random, 0.2-1.0 p.u.
-np.random.seed(0)  # Reproducibility
-wind_output = np.random.normal(0.5, 0.2, len(hours))
-wind_output = np.clip(wind_output, 0.2, 1.0)
+rng = np.random.RandomState(0)  # Reproducibility (same stream as np.random.seed(0))
+wind_output = rng.normal(0.5, 0.2, len(hours))
+np.clip(wind_output, 0.2, 1.0, out=wind_output)
 
 # Assign per-unit availabilities (p_max_pu) for each generator
-network.generators_t.p_max_pu = pd.DataFrame({
-    'Solar Plant': solar_output,
-    'Wind Farm': wind_output
-}, index=hours)
+# (stacked into one 2-D array so pandas wraps it as a single block)
+availability = np.column_stack([solar_output, wind_output])
+network.generators_t.p_max_pu = pd.DataFrame(availability, index=hours,
+                                             columns=['Solar Plant', 'Wind Farm'])
 
 # -------------------------------------------------
 # Step 4: Solve LOPF (Linear Optimal Power Flow)
 # -------------------------------------------------
-network.optimize(network.snapshots, solver_name='glpk')
+network.optimize(network.snapshots,
+                 solver_name='highs',
+                 solver_options={"parallel": "on", "presolve": "on", "solver": "simplex"})
 
 # --------------------------------------------
 # Step 5: Extract and Print Dispatch Results
@@ -115,7 +139,7 @@ plt.title('Generator Dispatch Over 24 Hours')
 plt.legend()
 plt.grid(True)
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # ==============================================================================
 # End of Case Study: Chapter 4
@@ -21,7 +21,8 @@
 #
 # Software Dependencies:
 #   - Python 3.8+
-#   - pypsa (v0.21+ recommended)
+#   - pypsa (v0.31+, including 1.x; linopy backend)
+#   - highspy (HiGHS LP solver)
 #   - numpy, pandas, matplotlib
 #
 # License: MIT
@@ -29,73 +30,99 @@
 # Date: June 2025
 # ==============================================================================
 
+import os
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import pypsa
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
+import highspy  # noqa: F401  (fail fast if the HiGHS solver is not installed)
+
+# Headless mode (HEADLESS=1): render off-screen with Agg and save figures to PNG
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+if HEADLESS:
+    matplotlib.use("Agg")
+_figure_ids = itertools.count(1)
+
+def show_figure():
+    # Show the current figure, or save and close it when running headless
+    if HEADLESS:
+        plt.savefig(f"chapter_5_cs_1_fig_{next(_figure_ids)}.png", dpi=100)
+        plt.close()
+    else:
+        plt.show()
+
+# HiGHS solver settings shared by all optimizations in this case study
+solver_options = {"parallel": "on", "presolve": "on", "solver": "simplex"}
+
+def solve_network(network):
+    # Optimize one network in place (worker for the concurrent solves below)
+    network.optimize(solver_name='highs', solver_options=solver_options)
+    return network
 
 # ---------------------------------------
 # PART 1: Fossil Fuel-Based Reference System
 # ---------------------------------------
 
-# Step 1: Initialize the PyPSA network (fossil system)
-network_old = pypsa.Network()
-
-# Step 2: Define simulation time frame (24 hours, hourly resolution)
+# Step 1: Define simulation time frame (24 hours, hourly resolution)
 snapshots = pd.date_range("2024-01-01", periods=24, freq="h")
-network_old.set_snapshots(snapshots)
-
-# Step 3: Add a main bus
-network_old.add("Bus", "Main Bus")
-
-# Step 4: Add conventional generators (coal and gas)
-network_old.add("Generator", "Coal Plant", 
-                bus="Main Bus",
-                p_nom=200, 
-                marginal_cost=80, 
-                carrier="coal")
-network_old.add("Generator", "Gas Plant", 
-                bus="Main Bus",
-                p_nom=150, 
-                marginal_cost=70, 
-                carrier="gas")
-
-# Step 5: Add baseline load profile (hourly demand)
-hourly_load = [180, 170, 165, 160, 160, 165, 170, 180, 190, 200,
-               210, 220, 230, 240, 245, 250, 245, 240, 230, 220,
-               210, 200, 190, 185]
-network_old.add("Load", "Baseline Load", bus="Main Bus", p_set=hourly_load)
-
-# Step 6: Optimize the fossil network (LOPF)
-network_old.optimize(solver_name='glpk')
 
-# Step 7: Output total system cost (OPEX only)
-print("\n====== Fossil System Results ======")
-print(f"Initial Fossil System Cost (OPEX only): {network_old.objective:.2f}")
+# Step 2: Define baseline load profile (hourly demand)
+hourly_load = pd.Series(np.array([180, 170, 165, 160, 160, 165, 170, 180, 190, 200,
+                                  210, 220, 230, 240, 245, 250, 245, 240, 230, 220,
+                                  210, 200, 190, 185], dtype=np.float64),
+                        index=snapshots)
+
+# Step 3: Build the fossil network, or reload the cached solved network
+#         (delete the .nc file after changing the baseline to force a rebuild)
+baseline_file = "ecoisle_baseline.nc"
+baseline_cached = os.path.exists(baseline_file)
+if not baseline_cached:
+    network_old = pypsa.Network()
+    network_old.set_snapshots(snapshots)
+
+    # Main bus
+    network_old.add("Bus", "Main Bus")
+
+    # Conventional generators (coal and gas)
+    network_old.add("Generator", "Coal Plant", 
+                    bus="Main Bus",
+                    p_nom=200, 
+                    marginal_cost=80, 
+                    carrier="coal")
+    network_old.add("Generator", "Gas Plant", 
+                    bus="Main Bus",
+                    p_nom=150, 
+                    marginal_cost=70, 
+                    carrier="gas")
+
+    # Baseline load
+    network_old.add("Load", "Baseline Load", bus="Main Bus", p_set=hourly_load)
+else:
+    network_old = pypsa.Network(baseline_file)
 
 # ---------------------------------------
 # PART 2: Renewable Energy System (Transition)
 # ---------------------------------------
 
-# Step 1: Initialize the PyPSA network (renewable system)
-network_new = pypsa.Network()
-network_new.set_snapshots(snapshots)
-network_new.add("Bus", "Main Bus")
-
-# Step 2: Define hourly availability for solar and wind (per-unit)
-solar_availability = [0, 0, 0, 0, 0, 0, 0.1, 0.2, 0.4, 0.6, 0.8, 
-                      0.9, 1.0, 0.9, 0.8, 0.6, 0.4, 0.2, 0.1, 0, 
-                      0, 0, 0, 0]
-wind_availability = [0.6, 0.7, 0.8, 0.6, 0.5, 0.4, 0.6, 0.7, 0.8, 
-                     0.7, 0.6, 0.5, 0.4, 0.5, 0.6, 0.7, 0.8, 0.7, 
-                     0.6, 0.5, 0.4, 0.5, 0.6, 0.7]
-
-# Step 3: Add generators (solar PV: extendable, wind: fixed, gas backup: fixed)
-network_new.add("Generator", "Gas Plant", 
-                bus="Main Bus",
-                p_nom=150, 
-                marginal_cost=200,    # Discourage gas use
-                carrier="gas")
+# Step 1: Start from a copy of the fossil network (same snapshots, bus and load)
+network_new = network_old.copy()
+network_new.remove("Generator", "Coal Plant")
+
+# Step 2: Define hourly availability for solar and wind (per-unit, snapshot-indexed)
+solar_availability = pd.Series(np.array([0, 0, 0, 0, 0, 0, 0.1, 0.2, 0.4, 0.6, 0.8,
+                                         0.9, 1.0, 0.9, 0.8, 0.6, 0.4, 0.2, 0.1, 0,
+                                         0, 0, 0, 0], dtype=np.float64),
+                               index=snapshots)
+wind_availability = pd.Series(np.array([0.6, 0.7, 0.8, 0.6, 0.5, 0.4, 0.6, 0.7, 0.8,
+                                        0.7, 0.6, 0.5, 0.4, 0.5, 0.6, 0.7, 0.8, 0.7,
+                                        0.6, 0.5, 0.4, 0.5, 0.6, 0.7], dtype=np.float64),
+                              index=snapshots)
+
+# Step 3: Reprice gas backup and add generators (solar PV: extendable, wind: fixed)
+network_new.generators.at["Gas Plant", "marginal_cost"] = 200    # Discourage gas use
 
 network_new.add("Generator", "Solar PV", 
                 bus="Main Bus",
@@ -113,21 +140,26 @@ network_new.add("Generator", "Onshore Wind",
                 p_max_pu=wind_availability,
                 carrier="wind")
 
-# Step 4: Add baseline load (same as fossil)
-network_new.add("Load", "Baseline Load", 
-                bus="Main Bus", 
-                p_set=hourly_load)
+# Step 4: Optimize the fossil (unless cached) and renewable systems concurrently
+networks_to_solve = [network_new] if baseline_cached else [network_old, network_new]
+with ThreadPoolExecutor(max_workers=len(networks_to_solve)) as executor:
+    list(executor.map(solve_network, networks_to_solve))
+if not baseline_cached:
+    network_old.export_to_netcdf(baseline_file)
 
-# Step 5: Optimize the renewable system (investment + dispatch optimization)
-network_new.optimize(solver_name='glpk')
+# Step 5: Print fossil system cost (OPEX only), renewable system cost
+#         (OPEX + CAPEX) and optimal solar capacity
+print("\n====== Fossil System Results ======")
+print(f"Initial Fossil System Cost (OPEX only): {network_old.objective:.2f}")
 
-# Step 6: Print total system cost (OPEX + CAPEX) and optimal solar capacity
 print("\n====== Renewable System Results ======")
 print(f"Renewable System Total Cost (OPEX + CAPEX): {network_new.objective:.2f}")
 print(f"Optimized Solar PV Capacity: {network_new.generators.at['Solar PV', 'p_nom_opt']:.2f} MW")
 
-# Step 7: Calculate OPEX-only for the renewable system (for comparison)
-renewable_opex = (network_new.generators_t.p * network_new.generators.marginal_cost).sum().sum()
+# Step 6: Calculate OPEX-only for the renewable system (for comparison)
+dispatch_new = network_new.generators_t.p
+marginal_costs = network_new.generators.marginal_cost.reindex(dispatch_new.columns).to_numpy()
+renewable_opex = float(np.einsum('ij,j->', dispatch_new.to_numpy(), marginal_costs))  # fused multiply-sum
 print(f"Renewable System OPEX only: {renewable_opex:.2f}")
 
 # ---------------------------------------
@@ -141,20 +173,16 @@ emission_factors = {
     "Solar PV": 0,
     "Onshore Wind": 0
 }
-for gen_name, ef in emission_factors.items():
-    if gen_name in network_old.generators.index:
-        network_old.generators.loc[gen_name, 'emission_factor'] = ef
-    if gen_name in network_new.generators.index:
-        network_new.generators.loc[gen_name, 'emission_factor'] = ef
+ef_series = pd.Series(emission_factors)
+for net in (network_old, network_new):
+    net.generators['emission_factor'] = ef_series.reindex(net.generators.index).fillna(0)
 
 # Step 2: Function to calculate total emissions
 def calculate_total_emissions(network):
-    emissions = 0
-    for gen_name, gen_data in network.generators.iterrows():
-        generation = network.generators_t.p[gen_name]
-        emission_factor = gen_data.get('emission_factor', 0)
-        emissions += sum(generation * emission_factor)
-    return emissions
+    # Single matrix product: hourly dispatch (snapshots x generators) @ emission factors
+    dispatch = network.generators_t.p
+    ef = network.generators['emission_factor'].reindex(dispatch.columns).fillna(0).to_numpy()
+    return float((dispatch.to_numpy() @ ef).sum())
 
 old_emissions = calculate_total_emissions(network_old)
 new_emissions = calculate_total_emissions(network_new)
@@ -168,13 +196,13 @@ print(f"Renewable System Emissions: {new_emissions:.1f} tons CO2")
 
 def plot_generation_dispatch(network, title):
     gen_dispatch = network.generators_t.p
-    gen_dispatch.plot(kind='bar', stacked=True, figsize=(15, 7))
-    plt.title(title)
-    plt.xlabel("Hour")
-    plt.ylabel("Generation (MW)")
-    plt.legend(title="Generator")
-    plt.tight_layout()
-    plt.show()
+    fig, ax = plt.subplots(figsize=(15, 7))
+    ax.stackplot(gen_dispatch.index, gen_dispatch.to_numpy().T,
+                 labels=gen_dispatch.columns)
+    ax.set(title=title, xlabel="Hour", ylabel="Generation (MW)")
+    ax.legend(title="Generator")
+    fig.tight_layout()
+    show_figure()
 
 print("\nPlotting generation dispatch for both systems...")
 
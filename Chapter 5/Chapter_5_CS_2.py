@@ -22,7 +22,8 @@
 #
 # Software Dependencies:
 #   - Python 3.8+
-#   - pypsa (v0.21+ recommended)
+#   - pypsa (v0.31+, including 1.x; linopy backend)
+#   - highspy (HiGHS LP solver)
 #   - numpy, pandas, matplotlib
 #
 # License: MIT
@@ -30,82 +31,98 @@
 # Date: June 2025
 # ==============================================================================
 
+import os
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import pypsa
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
+import highspy  # noqa: F401  (fail fast if the HiGHS solver is not installed)
+
+# Headless mode (HEADLESS=1): render off-screen with Agg and save figures to PNG
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+if HEADLESS:
+    matplotlib.use("Agg")
+_figure_ids = itertools.count(1)
+
+def show_figure():
+    # Show the current figure, or save and close it when running headless
+    if HEADLESS:
+        plt.savefig(f"chapter_5_cs_2_fig_{next(_figure_ids)}.png", dpi=100)
+        plt.close()
+    else:
+        plt.show()
+
+# HiGHS solver settings shared by all optimizations in this case study
+solver_options = {"parallel": "on", "presolve": "on", "solver": "simplex"}
+
+def solve_network(network):
+    # Optimize one network in place (worker for the concurrent solves below)
+    network.optimize(solver_name='highs', solver_options=solver_options)
+    return network
 
 # -------------------------------------------
 # PART 1: Baseline Fossil Fuel-Based Grid
 # -------------------------------------------
 
-# Step 1: Initialize the PyPSA network (baseline)
-network_old = pypsa.Network()
-network_old.set_snapshots(range(24))
-
-# Step 2: Add a main bus
-network_old.add("Bus", "Main Bus")
-
-# Step 3: Add conventional generators (coal and gas)
-network_old.add("Generator", "Coal Plant",
-                bus="Main Bus",
-                p_nom=150,
-                marginal_cost=70,
-                carrier="coal",
-                p_max_pu=[1.0]*24)
-network_old.add("Generator", "Gas Plant",
-                bus="Main Bus",
-                p_nom=100,
-                marginal_cost=50,
-                carrier="gas",
-                p_max_pu=[1.0]*24)
-
-# Step 4: Define a dynamic daily load profile
-dynamic_load = [100, 120, 140, 160, 180, 200, 220, 200, 180,
-                160, 140, 120, 110, 100, 110, 120, 140, 160,
-                180, 200, 220, 200, 180, 140]
-network_old.add("Load", "City Load", bus="Main Bus", p_set=dynamic_load)
-
-# Step 5: Optimize baseline network
-network_old.optimize(solver_name='glpk')
-
-# Step 6: Output baseline cost
-print("\n====== Windhaven Fossil Baseline ======")
-print(f"Total System Cost (OPEX): {network_old.objective:.2f}")
+# Step 1: Define time frame (24 hourly snapshots)
+snapshots = pd.RangeIndex(24)
+
+# Full availability profile, built once and shared by all fossil generators
+full_availability = pd.Series(1.0, index=snapshots)
+
+# Step 2: Define a dynamic daily load profile
+dynamic_load = pd.Series(np.array([100, 120, 140, 160, 180, 200, 220, 200, 180,
+                                   160, 140, 120, 110, 100, 110, 120, 140, 160,
+                                   180, 200, 220, 200, 180, 140], dtype=np.float64),
+                         index=snapshots)
+
+# Step 3: Build the baseline network, or reload the cached solved network
+#         (delete the .nc file after changing the baseline to force a rebuild)
+baseline_file = "windhaven_baseline.nc"
+baseline_cached = os.path.exists(baseline_file)
+if not baseline_cached:
+    network_old = pypsa.Network()
+    network_old.set_snapshots(snapshots)
+
+    # Main bus
+    network_old.add("Bus", "Main Bus")
+
+    # Conventional generators (coal and gas)
+    network_old.add("Generator", "Coal Plant",
+                    bus="Main Bus",
+                    p_nom=150,
+                    marginal_cost=70,
+                    carrier="coal",
+                    p_max_pu=full_availability)
+    network_old.add("Generator", "Gas Plant",
+                    bus="Main Bus",
+                    p_nom=100,
+                    marginal_cost=50,
+                    carrier="gas",
+                    p_max_pu=full_availability)
+
+    # Dynamic load
+    network_old.add("Load", "City Load", bus="Main Bus", p_set=dynamic_load)
+else:
+    network_old = pypsa.Network(baseline_file)
 
 # -------------------------------------------
 # PART 2: Wind and Storage Integration
 # -------------------------------------------
 
-# Step 1: Initialize new network
-network_new = pypsa.Network()
-network_new.set_snapshots(range(24))
-
-# Step 2: Replicate bus structure
-network_new.add("Bus", "Main Bus")
-
-# Step 3: Copy fossil generators (ensure robust copy)
-for gen in network_old.generators.index:
-    gen_data = network_old.generators.loc[gen]
-    # If capital_cost column is missing (PyPSA default), set to 0
-    capital_cost = gen_data.capital_cost if 'capital_cost' in gen_data.index else 0
-    network_new.add("Generator", gen, 
-                    bus=gen_data.bus, 
-                    p_nom=gen_data.p_nom, 
-                    marginal_cost=gen_data.marginal_cost, 
-                    capital_cost=capital_cost, 
-                    carrier=gen_data.carrier,
-                    p_max_pu=[1.0]*24)
-
-# Step 4: Add dynamic load
-network_new.add("Load", "City Load", bus="Main Bus", p_set=dynamic_load)
-
-# Step 5: Define wind pattern over 24 hours
-wind_pattern = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.85,
-                0.8, 0.75, 0.7, 0.65, 0.6, 0.55, 0.5, 0.45,
-                0.4, 0.35, 0.3, 0.25, 0.2, 0.15, 0.1, 0.05]
-
-# Step 6: Add wind generator (100 MW, capital and marginal cost)
+# Step 1: Start from a copy of the baseline (bus, fossil generators and load)
+network_new = network_old.copy()
+
+# Step 2: Define wind pattern over 24 hours
+wind_pattern = pd.Series(np.array([0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.85,
+                                   0.8, 0.75, 0.7, 0.65, 0.6, 0.55, 0.5, 0.45,
+                                   0.4, 0.35, 0.3, 0.25, 0.2, 0.15, 0.1, 0.05], dtype=np.float64),
+                         index=snapshots)
+
+# Step 3: Add wind generator (100 MW, capital and marginal cost)
 network_new.add("Generator", "Wind Farm",
                 bus="Main Bus",
                 p_nom=100,
@@ -114,7 +131,7 @@ network_new.add("Generator", "Wind Farm",
                 carrier="wind",
                 p_max_pu=wind_pattern)
 
-# Step 7: Add battery storage unit
+# Step 4: Add battery storage unit
 network_new.add("StorageUnit", "Battery Storage",
                 bus="Main Bus",
                 p_nom=40,
@@ -124,10 +141,17 @@ network_new.add("StorageUnit", "Battery Storage",
                 efficiency_dispatch=0.95,
                 state_of_charge_initial=0.1)
 
-# Step 8: Optimize new network
-network_new.optimize(solver_name='glpk')
+# Step 5: Optimize both networks concurrently (the baseline only if not cached)
+networks_to_solve = [network_new] if baseline_cached else [network_old, network_new]
+with ThreadPoolExecutor(max_workers=len(networks_to_solve)) as executor:
+    list(executor.map(solve_network, networks_to_solve))
+if not baseline_cached:
+    network_old.export_to_netcdf(baseline_file)
+
+# Step 6: Output results (baseline cost, cost with wind and storage)
+print("\n====== Windhaven Fossil Baseline ======")
+print(f"Total System Cost (OPEX): {network_old.objective:.2f}")
 
-# Step 9: Output results (cost, wind use, storage)
 print("\n====== Windhaven with Wind and Storage ======")
 print(f"Total System Cost (OPEX + CAPEX): {network_new.objective:.2f}")
 
@@ -156,14 +180,14 @@ storage_discharging = network_new.storage_units_t.p_dispatch["Battery Storage"]
 storage_soc = network_new.storage_units_t.state_of_charge["Battery Storage"]
 
 # Prepare DataFrames
-df_generation = pd.DataFrame(generation, index=hours)
-df_generation['Storage Discharge'] = storage_discharging  # Show on bar
+# (built from the result frames directly, without re-copying them)
+df_generation = generation.assign(**{'Storage Discharge': storage_discharging.to_numpy()})  # Show in stack
 
-df_storage = pd.DataFrame({
-    'Charging': storage_charging,
-    'Discharging': storage_discharging,
-    'SOC': storage_soc
-}, index=hours)
+df_storage = pd.concat([
+    storage_charging.rename('Charging'),
+    storage_discharging.rename('Discharging'),
+    storage_soc.rename('SOC')
+], axis=1)
 
 # Step 2: Plot generation and storage operations
 fig, ax1 = plt.subplots(figsize=(15, 7))
@@ -180,12 +204,12 @@ color_map = {
 plot_columns = [col for col in ['Coal Plant', 'Gas Plant', 'Wind Farm', 'Storage Discharge'] if col in df_generation.columns]
 bar_colors = [color_map[c] for c in plot_columns]
 
-df_generation[plot_columns].plot(
-    ax=ax1,
-    kind='bar',
-    stacked=True,
-    width=0.9,
-    color=bar_colors
+# Stacked areas: one filled polygon per source instead of one bar per hour
+ax1.stackplot(
+    hours,
+    df_generation[plot_columns].to_numpy().T,
+    labels=plot_columns,
+    colors=bar_colors
 )
 
 ax1.set_title("Power Generation and Storage Operations")
@@ -199,24 +223,27 @@ ax1.grid(axis='y', linestyle=':', alpha=0.6)
 # Step 3: Overlay storage charging, discharging, SOC on secondary y-axis
 ax2 = ax1.twinx()
 
-df_storage['Charging'].plot(
-    ax=ax2,
+ax2.plot(
+    hours,
+    df_storage['Charging'].to_numpy(),
     color='green',
     marker='^',
     linestyle='-',
     linewidth=1.5,
     label='Charging'
 )
-df_storage['Discharging'].plot(
-    ax=ax2,
+ax2.plot(
+    hours,
+    df_storage['Discharging'].to_numpy(),
     color='red',
     marker='v',
     linestyle='-',
     linewidth=1.5,
     label='Discharging'
 )
-df_storage['SOC'].plot(
-    ax=ax2,
+ax2.plot(
+    hours,
+    df_storage['SOC'].to_numpy(),
     color='blue',
     marker='x',
     linestyle='--',
@@ -230,15 +257,15 @@ ax2.legend(title="Storage Ops", loc='upper right', ncols=1)
 ax2.grid(axis='y', linestyle=':', alpha=0.4)
 
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # -------------------------------------------
 # PART 5: Cost and Emissions Analysis
 # -------------------------------------------
 
 # Step 1: Compute average energy cost
-old_total_load = sum(network_old.loads_t.p_set["City Load"])
-new_total_load = sum(network_new.loads_t.p_set["City Load"])
+old_total_load = network_old.loads_t.p_set["City Load"].sum()
+new_total_load = network_new.loads_t.p_set["City Load"].sum()
 old_avg_cost = network_old.objective / old_total_load
 new_avg_cost = network_new.objective / new_total_load
 
@@ -254,20 +281,18 @@ emission_factors = {
 }
 
 def assign_emissions(network, efactors):
-    for gen, ef in efactors.items():
-        if gen in network.generators.index:
-            network.generators.loc[gen, "emission_factor"] = ef
+    # One aligned column assignment; generators without a factor get 0
+    ef_series = pd.Series(efactors)
+    network.generators["emission_factor"] = ef_series.reindex(network.generators.index).fillna(0)
 
 assign_emissions(network_old, emission_factors)
 assign_emissions(network_new, emission_factors)
 
 def calculate_total_emissions(network):
-    total = 0
-    for gen_name, gen_data in network.generators.iterrows():
-        generation = network.generators_t.p[gen_name]
-        ef = gen_data.get("emission_factor", 0)
-        total += sum(generation * ef)
-    return total
+    # Single matrix product: hourly dispatch (snapshots x generators) @ emission factors
+    dispatch = network.generators_t.p
+    ef = network.generators["emission_factor"].reindex(dispatch.columns).fillna(0).to_numpy()
+    return float((dispatch.to_numpy() @ ef).sum())
 
 old_emissions = calculate_total_emissions(network_old)
 new_emissions = calculate_total_emissions(network_new)
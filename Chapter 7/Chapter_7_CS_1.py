@@ -26,20 +26,37 @@
 #
 # Software Dependencies:
 #   - Python 3.8+
-#   - pypsa (v0.21+ recommended)
+#   - pypsa (v0.31+, including 1.x; linopy backend)
+#   - highspy (HiGHS LP solver)
 #   - numpy, pandas, matplotlib
-#   - cartopy (optional, for advanced mapping)
 #
 # License: MIT
 # Version: 1.0
 # Date: June 2025
 # ==============================================================================
 
+import os
+import itertools
 import pypsa
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
-import cartopy  
+import highspy  # noqa: F401  (fail fast if the HiGHS solver is not installed)
+
+# Headless mode (HEADLESS=1): render off-screen with Agg and save figures to PNG
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+if HEADLESS:
+    matplotlib.use("Agg")
+_figure_ids = itertools.count(1)
+
+def show_figure():
+    # Show the current figure, or save and close it when running headless
+    if HEADLESS:
+        plt.savefig(f"chapter_7_cs_1_fig_{next(_figure_ids)}.png", dpi=100)
+        plt.close()
+    else:
+        plt.show()
 
 # ------------------------------------------------------------------------------
 # 1. Network Setup and Time Horizon
@@ -61,8 +78,6 @@ buses = [
     "NorthWind", "NorthSolar", "NorthStorage", "NorthHub",
     "SouthHub", "SouthLoad", "SouthBackupGen"
 ]
-for b in buses:
-    network.add("Bus", b)
 
 # Assign synthetic geographic coordinates for visualisation (arbitrary, not geo-accurate)
 bus_coords = {
@@ -74,9 +89,11 @@ bus_coords = {
     "SouthLoad": (10.3, 54.2),
     "SouthBackupGen": (10.7, 54.1)
 }
-for bus, (x, y) in bus_coords.items():
-    network.buses.at[bus, "x"] = x
-    network.buses.at[bus, "y"] = y
+
+# Add all buses with their coordinates in one batch
+network.add("Bus", buses,
+            x=[bus_coords[b][0] for b in buses],
+            y=[bus_coords[b][1] for b in buses])
 
 # ------------------------------------------------------------------------------
 # 3. Demand Profile (SouthGrid)
@@ -91,8 +108,10 @@ network.add("Load", "SouthDemand", bus="SouthLoad", p_set=load_profile)
 # ------------------------------------------------------------------------------
 
 # Generate reproducible wind and solar availability
-np.random.seed(0)
-wind_profile = pd.Series(np.clip(np.random.normal(0.6, 0.2, 168), 0, 1), index=snapshots)
+rng = np.random.RandomState(0)  # local generator, same stream as np.random.seed(0)
+wind = rng.normal(0.6, 0.2, 168)
+np.clip(wind, 0, 1, out=wind)
+wind_profile = pd.Series(wind, index=snapshots)
 wind_profile[60:70] = 0.2  # Deliberate wind lull to test system flexibility
 solar_profile = pd.Series(np.maximum(0, np.sin(np.linspace(0, 7*np.pi, 168))), index=snapshots)
 
@@ -142,17 +161,15 @@ internal_links = [
     ("SouthHub", "SouthLoad"),
     ("SouthBackupGen", "SouthHub")
 ]
-for a, b in internal_links:
-    network.add("Link", f"{a}_to_{b}", bus0=a, bus1=b, p_nom=1000, efficiency=1.0)
+bus0s, bus1s = zip(*internal_links)
+network.add("Link", [f"{a}_to_{b}" for a, b in internal_links],
+            bus0=list(bus0s), bus1=list(bus1s), p_nom=1000, efficiency=1.0)
 
 # Two parallel, extendable inter-regional corridors: A (costlier), B (cheaper)
-network.add("Link", "Corridor_A", bus0="NorthHub", bus1="SouthHub",
-            p_nom_extendable=True, efficiency=1.0,
-            capital_cost=200, carrier="AC")
-
-network.add("Link", "Corridor_B", bus0="NorthHub", bus1="SouthHub",
+network.add("Link", ["Corridor_A", "Corridor_B"],
+            bus0="NorthHub", bus1="SouthHub",
             p_nom_extendable=True, efficiency=1.0,
-            capital_cost=150, carrier="AC")
+            capital_cost=[200, 150], carrier="AC")
 
 # Global limit on total inter-zonal corridor buildout (forces trade-off)
 network.add("GlobalConstraint", "max_corridor_expansion",
@@ -178,8 +195,14 @@ network.add("GlobalConstraint", "co2_limit",
 # ------------------------------------------------------------------------------
 
 # Solve the co-optimisation problem: all assets sized/used for lowest cost
-# network.optimize(solver_name="highs", pyomo=True, keep_shadowprices=True)
-network.optimize(solver_name="glpk")
+# NOTE: network.optimize() builds the LP with the linopy backend, which replaced
+# the old Pyomo path (lopf(pyomo=True)) as a much faster, leaner formulation.
+# Do not switch back to pyomo=True; shadow prices are returned by default.
+network.optimize(solver_name="highs",
+                 solver_options={"solver": "simplex", "presolve": "on"})
+
+# Persist the solved system (incl. p_nom_opt); Chapter 8 fixes its capacities from it
+network.export_to_netcdf("ch7_solved.nc")
 
 # ------------------------------------------------------------------------------
 # 9. Results Visualisation and Diagnostics
@@ -200,15 +223,16 @@ import matplotlib.pyplot as plt
 
 # 1. Generation Dispatch (Stacked Area Plot)
 # ------------------------------------------
+gen_dispatch = network.generators_t.p
 fig, ax = plt.subplots(figsize=(12, 5))
-network.generators_t.p.plot.area(ax=ax)
+ax.stackplot(gen_dispatch.index, gen_dispatch.to_numpy().T, labels=gen_dispatch.columns)
 ax.set_title("Generation Dispatch (MW)", fontsize=16)
 ax.set_ylabel("Power Output (MW)", fontsize=16)
 ax.set_xlabel("Hour", fontsize=16)
 ax.tick_params(labelsize=16)
 ax.legend(fontsize=16)
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # 2. Transmission Flows: Corridor A vs Corridor B
 # -----------------------------------------------
@@ -220,7 +244,7 @@ ax.set_xlabel("Hour", fontsize=16)
 ax.tick_params(labelsize=16)
 ax.legend(fontsize=16)
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # 3. Marginal Prices (€/MWh) Across Buses
 # ---------------------------------------
@@ -232,21 +256,25 @@ ax.set_xlabel("Hour", fontsize=16)
 ax.tick_params(labelsize=16)
 ax.legend(fontsize=16, loc='upper right')
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # 4. Renewable Curtailment Over Time
 # ----------------------------------
-available = network.generators_t.p_max_pu.multiply(network.generators.p_nom_opt, axis=1)
-curtailment = (available - network.generators_t.p).clip(lower=0)
+# Broadcast optimal capacities over the availability array in NumPy, skipping
+# pandas' per-column label alignment
+pu = network.generators_t.p_max_pu
+nom = network.generators.p_nom_opt.reindex(pu.columns).to_numpy()
+available = pd.DataFrame(pu.to_numpy() * nom, index=pu.index, columns=pu.columns)
+curtailment = (available - network.generators_t.p[pu.columns]).clip(lower=0)
 fig, ax = plt.subplots(figsize=(12, 5))
-curtailment.plot.area(ax=ax)
+ax.stackplot(curtailment.index, curtailment.to_numpy().T, labels=curtailment.columns)
 ax.set_title("Curtailment (Wind + Solar)", fontsize=16)
 ax.set_ylabel("Curtailment (MW)", fontsize=16)
 ax.set_xlabel("Hour", fontsize=16)
 ax.tick_params(labelsize=16)
 ax.legend(fontsize=16, loc='upper right')
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # 5. Network Schematic with Labeled Corridors
 # -------------------------------------------
@@ -285,7 +313,7 @@ y_padding = (y_max - y_min) * 0.1
 ax.set_xlim(x_min - x_padding, x_max + x_padding)
 ax.set_ylim(y_min - y_padding, y_max + y_padding)
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # 6. Corridor Buildout Bar Chart
 # ------------------------------
@@ -304,7 +332,7 @@ for bar in bars:
                 textcoords="offset points",
                 ha='center', va='bottom', fontsize=11)
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # 7. Tabular Outputs and Key Metrics
 # ----------------------------------
@@ -34,7 +34,8 @@
 #
 # Software Dependencies:
 #   - Python 3.8+
-#   - pypsa (v0.21+ recommended)
+#   - pypsa (v0.31+, including 1.x; linopy backend)
+#   - highspy (HiGHS LP solver; GLPK is used as a fallback if missing)
 #   - numpy, pandas, matplotlib
 #
 # License: MIT
@@ -44,11 +45,36 @@
 
 
 # Imports
+import os
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import pypsa
 import numpy as np
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 
+# HiGHS is the preferred LP solver; fall back to GLPK (no warm start) if missing
+try:
+    import highspy  # noqa: F401
+    SOLVER_NAME = "highs"
+except ImportError:
+    SOLVER_NAME = "glpk"
+
+# Headless mode (HEADLESS=1): render off-screen with Agg and save figures to PNG
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+if HEADLESS:
+    matplotlib.use("Agg")
+_figure_ids = itertools.count(1)
+
+def show_figure():
+    # Show the current figure, or save and close it when running headless
+    if HEADLESS:
+        plt.savefig(f"chapter_8_cs_1_fig_{next(_figure_ids)}.png", dpi=100)
+        plt.close()
+    else:
+        plt.show()
+
 # Plotting style
 plt.rcParams.update({
     "font.size": 14,
@@ -56,7 +82,9 @@ plt.rcParams.update({
     "axes.labelsize": 14,
     "legend.fontsize": 12,
     "xtick.labelsize": 12,
-    "ytick.labelsize": 12
+    "ytick.labelsize": 12,
+    # Lay figures out once at draw time instead of calling tight_layout per figure
+    "figure.constrained_layout.use": True
 })
 
 # ------------------------------------------------------------------------------
@@ -66,37 +94,59 @@ plt.rcParams.update({
 # Time series: 168 hours (1 week)
 snapshots = pd.date_range("2025-01-01", periods=168, freq="H")
 
-# Demand profile: sinusoidal daily + weekly fluctuation
-load_profile = pd.Series(300 + 60 * np.sin(np.linspace(0, 3*np.pi, 168)), index=snapshots)
-
-# Wind and solar profiles (with slight variation)
-np.random.seed(0)
-wind_profile = pd.Series(np.clip(np.random.normal(0.6, 0.2, 168), 0, 1), index=snapshots)
-wind_profile[60:70] = 0.2  # wind lull for realism
-solar_profile = pd.Series(np.maximum(0, np.sin(np.linspace(0, 7*np.pi, 168))), index=snapshots)
-
-# Storm case (Scenario B)
-wind_storm = wind_profile.copy()
-wind_storm[60:100] *= 0.3  # storm reduces wind generation
-
-# Gas outage (Scenarios A & C)
-gas_availability = pd.Series(1.0, index=snapshots)
-gas_availability[40:60] = 0.0  # maintenance period
-
-# Corridor outage profile (Scenario A)
-corridor_b_outage = pd.Series(1.0, index=snapshots)
-corridor_b_outage[72:96] = 0.0  # simulated outage
+# Input profiles: built as NumPy arrays, then wrapped once as a snapshot-indexed
+# DataFrame with one column per profile
+t = np.arange(168)
+rng = np.random.RandomState(0)  # same draw as Chapter 7, no global RNG state
+wind = rng.normal(0.6, 0.2, 168)
+np.clip(wind, 0, 1, out=wind)
+wind[60:70] = 0.2  # wind lull for realism
+wind_storm = wind.copy()
+wind_storm[60:100] *= 0.3  # storm reduces wind generation (Scenario B)
+gas = np.ones(168)
+gas[40:60] = 0.0  # gas maintenance period (Scenarios A & C)
+corridor_b = np.ones(168)
+corridor_b[72:96] = 0.0  # simulated Corridor B outage (Scenario A)
+
+profiles = pd.DataFrame({
+    "load": 300 + 60 * np.sin(3 * np.pi * t / 167),  # sinusoidal daily + weekly demand
+    "wind": wind,
+    "solar": np.maximum(0, np.sin(7 * np.pi * t / 167)),
+    "wind_storm": wind_storm,
+    "gas": gas,
+    "corridor_b": corridor_b,
+    "full": 1.0,  # unrestricted availability
+}, index=snapshots)
 
 # Synthetic coordinates for plotting/network structure
-bus_coords = {
-    "NorthWind": (10.0, 56.0),
-    "NorthSolar": (11.0, 56.1),
-    "NorthStorage": (10.5, 55.8),
-    "NorthHub": (10.5, 55.5),
-    "SouthHub": (10.5, 54.5),
-    "SouthLoad": (10.3, 54.2),
-    "SouthBackupGen": (10.7, 54.1)
-}
+bus_df = pd.DataFrame([
+    ("NorthWind", 10.0, 56.0),
+    ("NorthSolar", 11.0, 56.1),
+    ("NorthStorage", 10.5, 55.8),
+    ("NorthHub", 10.5, 55.5),
+    ("SouthHub", 10.5, 54.5),
+    ("SouthLoad", 10.3, 54.2),
+    ("SouthBackupGen", 10.7, 54.1)
+], columns=["name", "x", "y"])
+
+# Fixed capacities (MW) from the Chapter 7 co-optimisation. If the solved Chapter 7
+# network exists (default: ../Chapter 7/ch7_solved.nc, override with CH7_SOLVED_FILE),
+# read p_nom_opt from it (clipping tiny negative solver noise); otherwise use the
+# rounded values quoted in the book. The source is printed because the two give
+# slightly different stress-test results
+CH7_SOLVED_FILE = os.environ.get("CH7_SOLVED_FILE", os.path.join("..", "Chapter 7", "ch7_solved.nc"))
+capacities = {"WindNorth": 670, "SolarNorth": 205, "GasSouth": 220,
+              "Corridor_A": 0, "Corridor_B": 360}
+if os.path.exists(CH7_SOLVED_FILE):
+    ch7_network = pypsa.Network(CH7_SOLVED_FILE)
+    p_nom_opt = pd.concat([ch7_network.generators.p_nom_opt, ch7_network.links.p_nom_opt])
+    capacities.update(p_nom_opt.reindex(list(capacities)).clip(lower=0).to_dict())
+    capacity_source = CH7_SOLVED_FILE
+else:
+    capacity_source = "book values (no solved Chapter 7 network found)"
+print(f"Fixed capacities (MW) from {capacity_source}:")
+for name, value in capacities.items():
+    print(f"  {name}: {value:.2f}")
 
 # Internal high-capacity links (within regions)
 internal_links = [
@@ -107,297 +157,162 @@ internal_links = [
     ("SouthHub", "SouthLoad")
 ]
 
+# Solver setup: Scenarios A-D share one LP structure (only bounds and the load
+# differ), so Scenario A's optimal basis warm-starts the HiGHS simplex in B-D
+solver_options = {"solver": "simplex", "parallel": "on"}
+scenario_basis_file = "scenario_a.bas"
+
+def solve_scenario(network, warmstart_fn=None, basis_fn=None):
+    # Solve a stress scenario, warm-starting HiGHS from a stored basis when given
+    if SOLVER_NAME == "highs":
+        network.optimize(solver_name="highs", solver_options=solver_options,
+                         warmstart_fn=warmstart_fn, basis_fn=basis_fn)
+    else:
+        network.optimize(solver_name="glpk")
+
+# ------------------------------------------------------------------------------
+# Shared Network Builder
+# ------------------------------------------------------------------------------
+
+# All four scenarios use the same fixed-capacity system; only the availability
+# of wind, solar, gas and Corridor B differs. Build it once and copy per scenario.
+
+def build_base_network():
+    # Fixed-capacity Chapter 7 system with unserved-energy backstop and CO2 cap
+    network = pypsa.Network()
+    network.set_snapshots(snapshots)
+
+    # Add all buses with predefined coordinates in one batch
+    network.add("Bus", bus_df["name"].tolist(),
+                x=bus_df["x"].values, y=bus_df["y"].values)
+
+    # Add load profile to SouthLoad bus
+    network.add("Load", "SouthDemand", bus="SouthLoad", p_set=profiles["load"])
+
+    # Fixed renewable and gas generators; availability is set per scenario
+    network.add("Generator", "WindNorth", bus="NorthWind", p_nom=capacities["WindNorth"],
+                p_nom_extendable=False, p_max_pu=profiles["wind"], marginal_cost=0)
+    network.add("Generator", "SolarNorth", bus="NorthSolar", p_nom=capacities["SolarNorth"],
+                p_nom_extendable=False, p_max_pu=profiles["solar"], marginal_cost=0)
+    network.add("Generator", "GasSouth", bus="SouthBackupGen", p_nom=capacities["GasSouth"],
+                p_nom_extendable=False, p_max_pu=profiles["full"],
+                marginal_cost=70, carrier="gas")
+
+    # Dummy generator to simulate unserved energy if demand cannot be met
+    network.add("Generator", "Unserved", bus="SouthLoad", p_nom_extendable=True,
+                capital_cost=0, marginal_cost=1000, carrier="load_shed")
+
+    # Battery unit (disabled in all stress tests)
+    network.add("StorageUnit", "Battery_North", bus="NorthStorage", p_nom=0,
+                p_nom_extendable=False, max_hours=4, efficiency_store=0.9,
+                efficiency_dispatch=0.9, capital_cost=200, marginal_cost=0.01)
+
+    # Add internal transmission links within each grid in one batch
+    network.add("Link", [f"{a}_to_{b}" for a, b in internal_links],
+                bus0=[a for a, _ in internal_links],
+                bus1=[b for _, b in internal_links],
+                p_nom=1000, efficiency=1.0)
+
+    # Use optimized transmission corridors from Chapter 7
+    network.add("Link", "Corridor_A", bus0="NorthHub", bus1="SouthHub",
+                p_nom=capacities["Corridor_A"], p_nom_extendable=False,
+                efficiency=1.0, carrier="AC")
+    network.add("Link", "Corridor_B", bus0="NorthHub", bus1="SouthHub",
+                p_nom=capacities["Corridor_B"], p_nom_extendable=False,
+                efficiency=1.0, p_max_pu=profiles["full"], carrier="AC")
+
+    # Add CO2 emissions constraint for gas-based generation
+    network.add("Carrier", "gas", co2_emissions=0.2)
+    network.add("GlobalConstraint", "co2_limit",
+                type="primary_energy_cap", carrier_attribute="co2_emissions",
+                sense="<=", constant=10000)
+    return network
+
+base_network = build_base_network()
+
+def build_scenario(wind_pu, solar_pu, gas_pu, corridor_b_pu):
+    # Copy the base system and overwrite only the scenario's availability profiles
+    network = base_network.copy()
+    network.generators_t.p_max_pu.loc[:, "WindNorth"] = wind_pu.values
+    network.generators_t.p_max_pu.loc[:, "SolarNorth"] = solar_pu.values
+    network.generators_t.p_max_pu.loc[:, "GasSouth"] = gas_pu.values
+    network.links_t.p_max_pu.loc[:, "Corridor_B"] = corridor_b_pu.values
+    return network
+
 # ------------------------------------------------------------------------------
 # SCENARIOS IMPLEMENTED BELOW
-# (A-D) are defined as separate network instances using shared inputs.
+# (A-D) are copies of the shared base network with their own availability.
 # ------------------------------------------------------------------------------
 
 # ------------------------------------------------------------------------------
 # Scenario A: Corridor B Outage (Hours 72–96)
 # ------------------------------------------------------------------------------
 
-# Create a new PyPSA network for Scenario A
-network_a = pypsa.Network()
-network_a.set_snapshots(snapshots)
-
-# Add all buses with predefined coordinates
-for bus, (x, y) in bus_coords.items():
-    network_a.add("Bus", bus, x=x, y=y)
-
-# Add load profile to SouthLoad bus
-network_a.add("Load", "SouthDemand", bus="SouthLoad", p_set=load_profile)
-
-# Add fixed renewable generators
-network_a.add("Generator", "WindNorth", bus="NorthWind", p_nom=670,
-              p_nom_extendable=False, p_max_pu=wind_profile, marginal_cost=0)
-network_a.add("Generator", "SolarNorth", bus="NorthSolar", p_nom=205,
-              p_nom_extendable=False, p_max_pu=solar_profile, marginal_cost=0)
-
-# Add gas generator with outage profile
-network_a.add("Generator", "GasSouth", bus="SouthBackupGen", p_nom=220,
-              p_nom_extendable=False, p_max_pu=gas_availability,
-              marginal_cost=70, carrier="gas")
-
-# Add dummy generator to simulate unserved energy if demand cannot be met
-network_a.add("Generator", "Unserved", bus="SouthLoad", p_nom_extendable=True,
-              capital_cost=0, marginal_cost=1000, carrier="load_shed")
-
-# Add a battery unit (disabled in this scenario)
-network_a.add("StorageUnit", "Battery_North", bus="NorthStorage", p_nom=0,
-              p_nom_extendable=False, max_hours=4, efficiency_store=0.9,
-              efficiency_dispatch=0.9, capital_cost=200, marginal_cost=0.01)
-
-# Add internal transmission links within each grid
-for a, b in internal_links:
-    network_a.add("Link", f"{a}_to_{b}", bus0=a, bus1=b,
-                  p_nom=1000, efficiency=1.0)
-
-# Add inter-regional corridors (Corridor B has forced outage via p_max_pu)
-network_a.add("Link", "Corridor_A", bus0="NorthHub", bus1="SouthHub",
-              p_nom=0, p_nom_extendable=False, efficiency=1.0, carrier="AC")
-network_a.add("Link", "Corridor_B", bus0="NorthHub", bus1="SouthHub",
-              p_nom=360, p_nom_extendable=False, efficiency=1.0,
-              p_max_pu=corridor_b_outage, carrier="AC")
-
-# Add CO2 emissions constraint for gas-based generation
-network_a.add("Carrier", "gas", co2_emissions=0.2)
-network_a.add("GlobalConstraint", "co2_limit",
-              type="primary_energy_cap", carrier_attribute="co2_emissions",
-              sense="<=", constant=10000)
-
-# Solve the optimization problem using GLPK solver
-network_a.optimize(solver_name="glpk")
-
-# Plot generation dispatch over time
-network_a.generators_t.p.plot.area(title="Scenario A: Dispatch (Corridor B Outage)", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-# Plot power flows across the transmission links
-network_a.links_t.p0.plot(title="Scenario A: Transmission Flows", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-# Plot marginal prices at each bus
-network_a.buses_t.marginal_price.plot(title="Scenario A: Marginal Prices", figsize=(12, 4))
-plt.ylabel("€/MWh"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-# Plot unserved energy to indicate supply shortage
-network_a.generators_t.p["Unserved"].plot(title="Scenario A: Unserved Energy", figsize=(12, 4), color='red')
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
+# Copy the base system with Corridor B out (72–96h) and the gas outage (40–60h)
+network_a = build_scenario(profiles["wind"], profiles["solar"], profiles["gas"], profiles["corridor_b"])
 
 # ------------------------------------------------------------------------------
 # Scenario B: Wind Collapse Due to Storm (Hours 60–100)
 # ------------------------------------------------------------------------------
 
-# Create a new network for Scenario B
-network_b = pypsa.Network()
-network_b.set_snapshots(snapshots)
-
-# Add all buses to the network
-for bus, (x, y) in bus_coords.items():
-    network_b.add("Bus", bus, x=x, y=y)
-
-# Add load profile to SouthLoad bus
-network_b.add("Load", "SouthDemand", bus="SouthLoad", p_set=load_profile)
-
-# Add wind generator with reduced output due to storm between 60–100h
-network_b.add("Generator", "WindNorth", bus="NorthWind", p_nom=670,
-              p_nom_extendable=False, p_max_pu=wind_storm, marginal_cost=0)
-
-# Add solar generator (normal operation)
-network_b.add("Generator", "SolarNorth", bus="NorthSolar", p_nom=205,
-              p_nom_extendable=False, p_max_pu=solar_profile, marginal_cost=0)
-
-# Gas generator is fully operational in this scenario
-network_b.add("Generator", "GasSouth", bus="SouthBackupGen", p_nom=220,
-              p_nom_extendable=False, p_max_pu=1.0, marginal_cost=70, carrier="gas")
-
-# Dummy generator to simulate unserved demand
-network_b.add("Generator", "Unserved", bus="SouthLoad", p_nom_extendable=True,
-              capital_cost=0, marginal_cost=1000, carrier="load_shed")
-
-# Battery storage is disabled in this test
-network_b.add("StorageUnit", "Battery_North", bus="NorthStorage", p_nom=0,
-              p_nom_extendable=False, max_hours=4, efficiency_store=0.9,
-              efficiency_dispatch=0.9, capital_cost=200, marginal_cost=0.01)
-
-# Add internal high-capacity links (non-restrictive)
-for a, b in internal_links:
-    network_b.add("Link", f"{a}_to_{b}", bus0=a, bus1=b,
-                  p_nom=1000, efficiency=1.0)
-
-# Use optimized transmission corridors from Chapter 7
-network_b.add("Link", "Corridor_A", bus0="NorthHub", bus1="SouthHub",
-              p_nom=0, p_nom_extendable=False, efficiency=1.0, carrier="AC")
-network_b.add("Link", "Corridor_B", bus0="NorthHub", bus1="SouthHub",
-              p_nom=360, p_nom_extendable=False, efficiency=1.0, carrier="AC")
-
-# Emissions constraint for CO2 from gas-based generation
-network_b.add("Carrier", "gas", co2_emissions=0.2)
-network_b.add("GlobalConstraint", "co2_limit",
-              type="primary_energy_cap", carrier_attribute="co2_emissions",
-              sense="<=", constant=10000)
-
-# Optimize with fixed capacities under storm conditions
-network_b.optimize(solver_name="glpk")
-
-# Plot results
-network_b.generators_t.p.plot.area(title="Scenario B: Dispatch (Wind Collapse)", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-network_b.links_t.p0.plot(title="Scenario B: Transmission Flows", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-network_b.buses_t.marginal_price.plot(title="Scenario B: Marginal Prices", figsize=(12, 4))
-plt.ylabel("€/MWh"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-network_b.generators_t.p["Unserved"].plot(title="Scenario B: Unserved Energy", figsize=(12, 4), color='red')
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
+# Copy the base system with wind output reduced by the storm (60–100h)
+network_b = build_scenario(profiles["wind_storm"], profiles["solar"], profiles["full"], profiles["full"])
 
 # ------------------------------------------------------------------------------
 # Scenario C: Gas Maintenance + Battery Failure
 # ------------------------------------------------------------------------------
 
-# Create a new network for Scenario C
-network_c = pypsa.Network()
-network_c.set_snapshots(snapshots)
-
-# Add all buses to the network
-for bus, (x, y) in bus_coords.items():
-    network_c.add("Bus", bus, x=x, y=y)
-
-# Add base load to the SouthLoad bus
-network_c.add("Load", "SouthDemand", bus="SouthLoad", p_set=load_profile)
-
-# Wind and solar generators operate normally
-network_c.add("Generator", "WindNorth", bus="NorthWind", p_nom=670,
-              p_nom_extendable=False, p_max_pu=wind_profile, marginal_cost=0)
-network_c.add("Generator", "SolarNorth", bus="NorthSolar", p_nom=205,
-              p_nom_extendable=False, p_max_pu=solar_profile, marginal_cost=0)
+# Copy the base system with the gas maintenance outage (40–60h); battery stays at 0 MW
+network_c = build_scenario(profiles["wind"], profiles["solar"], profiles["gas"], profiles["full"])
 
-# Gas generator with maintenance outage from 40–60h (availability = 0)
-network_c.add("Generator", "GasSouth", bus="SouthBackupGen", p_nom=220,
-              p_nom_extendable=False, p_max_pu=gas_availability,
-              marginal_cost=70, carrier="gas")
-
-# Dummy generator to track unserved demand
-network_c.add("Generator", "Unserved", bus="SouthLoad", p_nom_extendable=True,
-              capital_cost=0, marginal_cost=1000, carrier="load_shed")
-
-# Battery is non-operational due to failure during the test horizon
-network_c.add("StorageUnit", "Battery_North", bus="NorthStorage", p_nom=0,
-              p_nom_extendable=False, max_hours=4, efficiency_store=0.9,
-              efficiency_dispatch=0.9, capital_cost=200, marginal_cost=0.01)
-
-# Internal links remain unconstrained
-for a, b in internal_links:
-    network_c.add("Link", f"{a}_to_{b}", bus0=a, bus1=b,
-                  p_nom=1000, efficiency=1.0)
-
-# Transmission corridors as previously optimized
-network_c.add("Link", "Corridor_A", bus0="NorthHub", bus1="SouthHub",
-              p_nom=0, p_nom_extendable=False, efficiency=1.0, carrier="AC")
-network_c.add("Link", "Corridor_B", bus0="NorthHub", bus1="SouthHub",
-              p_nom=360, p_nom_extendable=False, efficiency=1.0, carrier="AC")
-
-# CO2 emissions limit to constrain gas generation
-network_c.add("Carrier", "gas", co2_emissions=0.2)
-network_c.add("GlobalConstraint", "co2_limit",
-              type="primary_energy_cap", carrier_attribute="co2_emissions",
-              sense="<=", constant=10000)
-
-# Run optimization with GLPK under gas and storage outage
-network_c.optimize(solver_name="glpk")
-
-# Plot dispatch results
-network_c.generators_t.p.plot.area(title="Scenario C: Dispatch (Gas + Battery Outage)", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-# Plot transmission flows
-network_c.links_t.p0.plot(title="Scenario C: Transmission Flows", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
+# ------------------------------------------------------------------------------
+# Scenario D: Heatwave + Solar Dip
+# ------------------------------------------------------------------------------
 
-# Plot marginal prices
-network_c.buses_t.marginal_price.plot(title="Scenario C: Marginal Prices", figsize=(12, 4))
-plt.ylabel("€/MWh"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
+# Copy the base system with full gas availability to meet high demand
+network_d = build_scenario(profiles["wind"], profiles["solar"], profiles["full"], profiles["full"])
 
-# Plot unserved energy output
-network_c.generators_t.p["Unserved"].plot(title="Scenario C: Unserved Energy", figsize=(12, 4), color='red')
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
+# ------------------------------------------------------------------------------
+# Solve Scenarios
+# ------------------------------------------------------------------------------
 
+# Solve Scenario A first to store its basis, then B-D concurrently from it
+solve_scenario(network_a, basis_fn=scenario_basis_file)
+with ThreadPoolExecutor(max_workers=3) as executor:
+    list(executor.map(lambda net: solve_scenario(net, warmstart_fn=scenario_basis_file),
+                      [network_b, network_c, network_d]))
 
 # ------------------------------------------------------------------------------
-# Scenario D: Heatwave + Solar Dip
+# Scenario Results
 # ------------------------------------------------------------------------------
 
-# Create a new network for Scenario D
-network_d = pypsa.Network()
-network_d.set_snapshots(snapshots)
-
-# Add all buses with coordinates
-for bus, (x, y) in bus_coords.items():
-    network_d.add("Bus", bus, x=x, y=y)
-
-# Demand includes a heatwave-induced spike from hour 110 to 140 (already built into load_profile)
-network_d.add("Load", "SouthDemand", bus="SouthLoad", p_set=load_profile)
-
-# Wind generator operates with normal profile
-network_d.add("Generator", "WindNorth", bus="NorthWind", p_nom=670,
-              p_nom_extendable=False, p_max_pu=wind_profile, marginal_cost=0)
-
-# Solar generation is reduced due to assumed cloud cover (reflected in solar_profile)
-network_d.add("Generator", "SolarNorth", bus="NorthSolar", p_nom=205,
-              p_nom_extendable=False, p_max_pu=solar_profile, marginal_cost=0)
-
-# Gas generator is fully available to meet high demand
-network_d.add("Generator", "GasSouth", bus="SouthBackupGen", p_nom=220,
-              p_nom_extendable=False, p_max_pu=1.0, marginal_cost=70, carrier="gas")
-
-# Dummy generator allows unmet demand to be captured as unserved energy
-network_d.add("Generator", "Unserved", bus="SouthLoad", p_nom_extendable=True,
-              capital_cost=0, marginal_cost=1000, carrier="load_shed")
-
-# Battery unit is disabled to isolate the system's thermal and dispatch limits
-network_d.add("StorageUnit", "Battery_North", bus="NorthStorage", p_nom=0,
-              p_nom_extendable=False, max_hours=4, efficiency_store=0.9,
-              efficiency_dispatch=0.9, capital_cost=200, marginal_cost=0.01)
-
-# Add internal connections (non-limiting)
-for a, b in internal_links:
-    network_d.add("Link", f"{a}_to_{b}", bus0=a, bus1=b,
-                  p_nom=1000, efficiency=1.0)
-
-# Add optimized corridors
-network_d.add("Link", "Corridor_A", bus0="NorthHub", bus1="SouthHub",
-              p_nom=0, p_nom_extendable=False, efficiency=1.0, carrier="AC")
-network_d.add("Link", "Corridor_B", bus0="NorthHub", bus1="SouthHub",
-              p_nom=360, p_nom_extendable=False, efficiency=1.0, carrier="AC")
-
-# CO2 emissions constraint remains active
-network_d.add("Carrier", "gas", co2_emissions=0.2)
-network_d.add("GlobalConstraint", "co2_limit",
-              type="primary_energy_cap", carrier_attribute="co2_emissions",
-              sense="<=", constant=10000)
-
-# Solve the network with high load and weak solar availability
-network_d.optimize(solver_name="glpk")
-
-# Plot generation dispatch under heatwave and solar dip
-network_d.generators_t.p.plot.area(title="Scenario D: Dispatch (Heatwave + Solar Dip)", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-# Plot transmission link power flows
-network_d.links_t.p0.plot(title="Scenario D: Transmission Flows", figsize=(12, 4))
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-# Plot marginal electricity prices at buses
-network_d.buses_t.marginal_price.plot(title="Scenario D: Marginal Prices", figsize=(12, 4))
-plt.ylabel("€/MWh"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
-
-# Plot unserved energy during critical peak demand
-network_d.generators_t.p["Unserved"].plot(title="Scenario D: Unserved Energy", figsize=(12, 4), color='red')
-plt.ylabel("MW"); plt.xlabel("Hour"); plt.tight_layout(); plt.show()
+# One 4x4 grid: a row per scenario with its dispatch, transmission flows,
+# marginal prices and unserved energy, instead of 16 separate figures
+scenario_results = [
+    ("A", network_a, "Dispatch (Corridor B Outage)"),
+    ("B", network_b, "Dispatch (Wind Collapse)"),
+    ("C", network_c, "Dispatch (Gas + Battery Outage)"),
+    ("D", network_d, "Dispatch (Heatwave + Solar Dip)"),
+]
+fig, axes = plt.subplots(4, 4, figsize=(24, 16))
+for row, (label, network, dispatch_title) in zip(axes, scenario_results):
+    # Pull each scenario's result tables once and plot from the locals
+    gens_p = network.generators_t.p
+    links_p0 = network.links_t.p0
+    prices = network.buses_t.marginal_price
+    unserved = gens_p["Unserved"]
+
+    # Generation dispatch over time
+    gens_p.plot.area(ax=row[0], title=f"Scenario {label}: {dispatch_title}")
+    # Power flows across the transmission links
+    links_p0.plot(ax=row[1], title=f"Scenario {label}: Transmission Flows")
+    # Marginal prices at each bus
+    prices.plot(ax=row[2], title=f"Scenario {label}: Marginal Prices")
+    # Unserved energy indicates supply shortage
+    unserved.plot(ax=row[3], title=f"Scenario {label}: Unserved Energy", color='red')
+    for ax, unit in zip(row, ["MW", "MW", "€/MWh", "MW"]):
+        ax.set(xlabel="Hour", ylabel=unit)
+show_figure()
 
 # ------------------------------------------------------------------------------
 # Conclusion
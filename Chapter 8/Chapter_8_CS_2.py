@@ -30,7 +30,8 @@
 #
 # Software Dependencies:
 #   - Python 3.8+
-#   - pypsa (v0.21+ recommended)
+#   - pypsa (v0.31+, including 1.x; linopy backend)
+#   - highspy (HiGHS LP solver; GLPK is used as a fallback if missing)
 #   - numpy, pandas, matplotlib
 #
 # License: MIT
@@ -38,11 +39,49 @@
 # Date: June 2025
 # ==============================================================================
 
+import os
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import pypsa
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 
+# HiGHS is the preferred LP solver; fall back to GLPK (no warm start) if missing
+try:
+    import highspy  # noqa: F401
+    SOLVER_NAME = "highs"
+except ImportError:
+    SOLVER_NAME = "glpk"
+
+# Headless mode (HEADLESS=1): render off-screen with Agg and save figures to PNG
+HEADLESS = os.environ.get("HEADLESS", "0") == "1"
+if HEADLESS:
+    matplotlib.use("Agg")
+_figure_ids = itertools.count(1)
+
+def show_figure():
+    # Show the current figure, or save and close it when running headless
+    if HEADLESS:
+        plt.savefig(f"chapter_8_cs_2_fig_{next(_figure_ids)}.png", dpi=100)
+        plt.close()
+    else:
+        plt.show()
+
+# Solver setup: every contingency differs from the base OPF by one line rating,
+# so the base OPF basis warm-starts the HiGHS simplex for each outage
+solver_options = {"solver": "simplex", "parallel": "on"}
+base_basis_file = "base_opf.bas"
+
+def solve_opf(network, warmstart_fn=None, basis_fn=None):
+    # Solve an OPF case, warm-starting HiGHS from a stored basis when given
+    if SOLVER_NAME == "highs":
+        network.optimize(solver_name="highs", solver_options=solver_options,
+                         warmstart_fn=warmstart_fn, basis_fn=basis_fn)
+    else:
+        network.optimize(solver_name="glpk")
+
 # -----------------------------
 # 1. Create Base Network
 # -----------------------------
@@ -50,97 +89,112 @@ n = pypsa.Network()
 n.set_snapshots(pd.date_range("2025-01-01", periods=1, freq="h"))
 
 # Add 5 buses
-for i in range(5):
-    n.add("Bus", f"Bus {i}", carrier="AC")
+n.add("Bus", [f"Bus {i}" for i in range(5)], carrier="AC")
 
 # Add generators (wind, gas, CHP, diesel)
-n.add("Generator", "G0", bus="Bus 0", p_nom=100, marginal_cost=0, carrier="wind")
-n.add("Generator", "G1", bus="Bus 1", p_nom=80, marginal_cost=50, carrier="gas")
-n.add("Generator", "G2", bus="Bus 2", p_nom=40, marginal_cost=40, carrier="chp")
-n.add("Generator", "G3", bus="Bus 3", p_nom=100, marginal_cost=200, carrier="diesel")
+n.add("Generator", ["G0", "G1", "G2", "G3"],
+      bus=["Bus 0", "Bus 1", "Bus 2", "Bus 3"],
+      p_nom=[100, 80, 40, 100],
+      marginal_cost=[0, 50, 40, 200],
+      carrier=["wind", "gas", "chp", "diesel"])
 
 # Add loads
-n.add("Load", "Load1", bus="Bus 1", p_set=50)
-n.add("Load", "Load2", bus="Bus 2", p_set=30)
-n.add("Load", "Load3", bus="Bus 3", p_set=40)
-n.add("Load", "Load4", bus="Bus 4", p_set=80)
+n.add("Load", ["Load1", "Load2", "Load3", "Load4"],
+      bus=["Bus 1", "Bus 2", "Bus 3", "Bus 4"],
+      p_set=[50, 30, 40, 80])
 
 # Add transmission lines (loop + radial)
 line_params = dict(carrier="AC", x=0.1, r=0.01, s_nom=100)
-n.add("Line", "Line_0_1", bus0="Bus 0", bus1="Bus 1", **line_params)
-n.add("Line", "Line_1_2", bus0="Bus 1", bus1="Bus 2", **line_params)
-n.add("Line", "Line_2_3", bus0="Bus 2", bus1="Bus 3", **line_params)
-n.add("Line", "Line_3_0", bus0="Bus 3", bus1="Bus 0", **line_params)
-n.add("Line", "Line_1_4", bus0="Bus 1", bus1="Bus 4", **line_params)
+line_ends = [(0, 1), (1, 2), (2, 3), (3, 0), (1, 4)]
+n.add("Line", [f"Line_{a}_{b}" for a, b in line_ends],
+      bus0=[f"Bus {a}" for a, _ in line_ends],
+      bus1=[f"Bus {b}" for _, b in line_ends],
+      **line_params)
 
 # Add high-cost unserved generators at each bus
-for i in range(5):
-    n.add("Generator", f"Unserved_{i}", bus=f"Bus {i}", p_nom=1e4, marginal_cost=10000, carrier="unserved")
+n.add("Generator", [f"Unserved_{i}" for i in range(5)],
+      bus=[f"Bus {i}" for i in range(5)],
+      p_nom=1e4, marginal_cost=10000, carrier="unserved")
 
 # -----------------------------
-# 2. Solve Base OPF & Save to Disk
+# 2. Solve Base OPF
 # -----------------------------
-n.optimize(solver_name="glpk")
+contingency_lines = ["Line_0_1", "Line_1_4", "Line_1_2", "Line_2_3", "Line_3_0"]
+
+# Unserved-energy generators are the same in every contingency; select them once
+unserved_cols = [g for g in n.generators.index if g.startswith("Unserved_")]
+
+def outage_network(line):
+    # In-memory copy of the base network (unserved generators included) with one line out
+    m = n.copy()
+    m.lines.at[line, "s_nom"] = 0  # outage the line
+    return m
+
+# Copy the outage cases from the unsolved base so they do not carry its solver model
+outage_networks = [outage_network(line) for line in contingency_lines]
+
+solve_opf(n, basis_fn=base_basis_file)
 ofp_dispatch = n.generators_t.p.copy()
 ofp_cost = n.objective
-n.export_to_netcdf("base_network.nc")
 
 # -----------------------------
 # 3. SCOPF Simulation: Outage each line
 # -----------------------------
-contingency_lines = ["Line_0_1", "Line_1_4", "Line_1_2", "Line_2_3", "Line_3_0"]
-scopf_dispatches = []
-scopf_costs = []
-scopf_unserved = []
 
-for line in contingency_lines:
-    m = pypsa.Network("base_network.nc")
-    m.lines.at[line, "s_nom"] = 0  # outage the line
+def solve_outage(m):
+    # Re-optimize one contingency; returns (dispatch, cost, unserved) or None if infeasible
+    solve_opf(m, warmstart_fn=base_basis_file)
+    if m.objective is None:
+        return None
+    unserved_sum = m.generators_t.p[unserved_cols].to_numpy().sum()  # single snapshot
+    return m.generators_t.p, m.objective, unserved_sum
 
-    for bus in m.buses.index:
-        if f"Unserved_{bus}" not in m.generators.index:
-            m.add("Generator", f"Unserved_{bus}", bus=bus, p_nom=1e4, marginal_cost=10000, carrier="unserved")
+# Run the independent contingency solves concurrently
+with ThreadPoolExecutor(max_workers=len(outage_networks)) as executor:
+    outage_results = list(executor.map(solve_outage, outage_networks))
 
-    status = m.optimize(solver_name="glpk")
-    if m.objective is None:
+# Per-contingency cost and unserved energy, preallocated (NaN marks infeasible cases)
+scopf_dispatches = []
+scopf_costs = np.full(len(contingency_lines), np.nan)
+scopf_unserved = np.full(len(contingency_lines), np.nan)
+for i, (line, result) in enumerate(zip(contingency_lines, outage_results)):
+    if result is None:
         print(f"Infeasible for outage: {line}")
         continue
-
-    scopf_dispatches.append(m.generators_t.p)
-    scopf_costs.append(m.objective)
-    unserved_sum = m.generators_t.p.filter(like="Unserved").sum(axis=1).values[0]
-    scopf_unserved.append(unserved_sum)
-
-# Conservative dispatch: max output needed across all feasible SCOPF cases
-scopf_dispatch = pd.concat(scopf_dispatches).groupby(level=0).max() if scopf_dispatches else ofp_dispatch.copy()
+    dispatch, scopf_costs[i], scopf_unserved[i] = result
+    scopf_dispatches.append(dispatch)
+feasible = ~np.isnan(scopf_costs)
+
+# Conservative dispatch: element-wise max output needed across all feasible SCOPF cases
+if scopf_dispatches:
+    scopf_dispatch = pd.DataFrame(np.maximum.reduce([d.to_numpy() for d in scopf_dispatches]),
+                                  index=scopf_dispatches[0].index,
+                                  columns=scopf_dispatches[0].columns)
+else:
+    scopf_dispatch = ofp_dispatch.copy()
 
 # -----------------------------
 # 4. Plot OPF vs. SCOPF Dispatch
 # -----------------------------
-ofp_dispatch["type"] = "Base OPF"
-scopf_dispatch["type"] = "Strict SCOPF"
-ofp_dispatch.columns = ofp_dispatch.columns.astype(str)
-scopf_dispatch.columns = scopf_dispatch.columns.astype(str)
-
-dispatch_all = pd.concat([ofp_dispatch, scopf_dispatch])
-dispatch_all = dispatch_all.reset_index().melt(id_vars=["snapshot", "type"], 
-                                               var_name="Generator", 
-                                               value_name="Dispatch")
-
-plt.figure(figsize=(7, 4.5))
 generators = ["G0", "G1", "G2", "G3"]
 colors = {"Base OPF": "#4575b4", "Strict SCOPF": "#d73027"}
 hatch = {"Base OPF": "//", "Strict SCOPF": ""}
 
-for i, gen in enumerate(generators):
-    for j, mode in enumerate(["Base OPF", "Strict SCOPF"]):
-        val = dispatch_all[(dispatch_all["Generator"] == gen) & (dispatch_all["type"] == mode)]["Dispatch"].values[0]
-        offset = -0.18 if mode == "Base OPF" else 0.18
-        plt.bar(i + offset, val, width=0.36, 
-                color=colors[mode], 
-                hatch=hatch[mode], 
-                edgecolor="k", 
-                label=mode if i == 0 else None)
+# Single-snapshot dispatch of each generator, one array per mode
+dispatch_by_mode = {
+    "Base OPF": ofp_dispatch[generators].to_numpy()[0],
+    "Strict SCOPF": scopf_dispatch[generators].to_numpy()[0],
+}
+
+# One grouped bar call per mode, offset either side of each generator tick
+plt.figure(figsize=(7, 4.5))
+x = np.arange(len(generators))
+for mode, offset in (("Base OPF", -0.18), ("Strict SCOPF", 0.18)):
+    plt.bar(x + offset, dispatch_by_mode[mode], width=0.36,
+            color=colors[mode],
+            hatch=hatch[mode],
+            edgecolor="k",
+            label=mode)
 
 plt.xticks(range(len(generators)), generators, fontsize=12)
 plt.ylabel("Dispatch (MW)", fontsize=12)
@@ -148,16 +202,16 @@ plt.title("Generator Dispatch: Base OPF vs. Strict SCOPF", fontsize=12, pad=12)
 plt.legend(fontsize=12, frameon=False)
 plt.grid(axis="y", linestyle="--", alpha=0.6)
 plt.tight_layout()
-plt.show()
+show_figure()
 
 # -----------------------------
 # 5. Print Summary Stats
 # -----------------------------
 print("Base OPF cost:", round(ofp_cost, 2))
-print("Average SCOPF contingency cost:", round(np.mean(scopf_costs), 2))
-print("Worst-case SCOPF contingency cost:", round(np.max(scopf_costs), 2))
-print("Average unserved energy (MW) in SCOPF cases:", round(np.mean(scopf_unserved), 2))
-print("Max unserved energy (MW) in SCOPF cases:", round(np.max(scopf_unserved), 2))
+print("Average SCOPF contingency cost:", round(scopf_costs[feasible].mean(), 2))
+print("Worst-case SCOPF contingency cost:", round(scopf_costs[feasible].max(), 2))
+print("Average unserved energy (MW) in SCOPF cases:", round(scopf_unserved[feasible].mean(), 2))
+print("Max unserved energy (MW) in SCOPF cases:", round(scopf_unserved[feasible].max(), 2))
 
 # ==============================================================================
 # End of Security-Constrained Optimal Power Flow (SCOPF) Case Study (Chapter 8)
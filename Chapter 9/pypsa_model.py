@@ -1,83 +1,95 @@
 import pypsa
 import pandas as pd
 
+# Buses with coordinates (approximate lat/lon for Danish cities)
+BUSES = {
+    'Copenhagen': {'lat': 55.6761, 'lon': 12.5683},
+    'Aarhus': {'lat': 56.1629, 'lon': 10.2039},
+    'Aalborg': {'lat': 57.0488, 'lon': 9.9217}
+}
+
+# Generators: name -> (bus, carrier); capacity_<carrier> and cost_<carrier> set them
+GENERATORS = {
+    'wind_Copenhagen': ('Copenhagen', 'wind'),
+    'solar_Aarhus': ('Aarhus', 'solar'),
+    'gas_Aalborg': ('Aalborg', 'gas')
+}
+
+# Transmission lines connecting the nodes: (from, to, length in km)
+LINES = [
+    ("Copenhagen", "Aarhus", 150),
+    ("Aarhus", "Aalborg", 100),
+    ("Aalborg", "Copenhagen", 200)
+]
+
+# Result column order for generator outputs and line flows
+GEN_NAMES = tuple(GENERATORS)
+LINE_NAMES = tuple(f"{bus0}_{bus1}" for bus0, bus1, _ in LINES)
+
+def run_pypsa_model_batch(params_df):
+    # Solve one dispatch problem per row of params_df in a single LP. Columns are
+    # named like the run_pypsa_model arguments (demand_<bus>, capacity_<carrier>,
+    # cost_<carrier>); each row becomes one snapshot. Snapshots are not coupled
+    # (no storage or expansion), so each row's dispatch equals a separate solve.
+    network = pypsa.Network()
+    network.set_snapshots(range(len(params_df)))
+    snapshots = network.snapshots
+
+    for bus, coords in BUSES.items():
+        network.add("Bus", bus, x=coords['lon'], y=coords['lat'])
+
+    # Capacities (MW) and marginal costs (€/MWh) per snapshot. p_nom is fixed at
+    # the largest requested capacity and p_max_pu scales it down row by row.
+    capacity = pd.DataFrame({gen: params_df[f"capacity_{carrier}"].to_numpy(dtype=float)
+                             for gen, (_, carrier) in GENERATORS.items()}, index=snapshots)
+    cost = pd.DataFrame({gen: params_df[f"cost_{carrier}"].to_numpy(dtype=float)
+                         for gen, (_, carrier) in GENERATORS.items()}, index=snapshots)
+    p_nom = capacity.max()
+    p_max_pu = capacity / p_nom.where(p_nom > 0, 1.0)
+    for gen, (bus, carrier) in GENERATORS.items():
+        network.add("Generator", gen, bus=bus, carrier=carrier,
+                    p_nom=p_nom[gen],
+                    p_max_pu=p_max_pu[gen],
+                    marginal_cost=cost[gen])
+
+    # Loads at each bus (MW)
+    for bus in BUSES:
+        network.add("Load", f"load_{bus}", bus=bus,
+                    p_set=pd.Series(params_df[f"demand_{bus}"].to_numpy(dtype=float), index=snapshots))
+
+    # Transmission lines (using a simplified impedance factor)
+    for name, (bus0, bus1, length) in zip(LINE_NAMES, LINES):
+        network.add("Line", name, bus0=bus0, bus1=bus1, x=length * 0.01, s_nom=100)
+
+    # Solve the linear optimal power flow problem for all parameter sets at once.
+    network.optimize(solver_name="glpk")
+
+    # Generator outputs (N x generators) and line flows (N x lines).
+    return network.generators_t.p, network.lines_t.p0
+
 def run_pypsa_model(demand_Copenhagen, demand_Aarhus, demand_Aalborg,
                     capacity_wind, cost_wind,
                     capacity_solar, cost_solar,
                     capacity_gas, cost_gas):
-    # Create a network and define one snapshot (time step)
-    network = pypsa.Network()
-    network.set_snapshots([0])
-    
-    # Define buses with coordinates (approximate lat/lon for Danish cities)
-    buses = {
-        'Copenhagen': {'lat': 55.6761, 'lon': 12.5683},
-        'Aarhus': {'lat': 56.1629, 'lon': 10.2039},
-        'Aalborg': {'lat': 57.0488, 'lon': 9.9217}
-    }
-    
-    for bus, coords in buses.items():
-        network.add("Bus", bus, x=coords['lon'], y=coords['lat'])
-    
-    # Add generators with user-defined capacities (MW) and marginal costs (€/MWh)
-    # Copenhagen: Wind generator
-    network.add("Generator", "wind_Copenhagen",
-                bus="Copenhagen",
-                p_nom=capacity_wind,
-                marginal_cost=cost_wind,
-                carrier="wind",
-                p_max_pu=1.0)
-    
-    # Aarhus: Solar generator
-    network.add("Generator", "solar_Aarhus",
-                bus="Aarhus",
-                p_nom=capacity_solar,
-                marginal_cost=cost_solar,
-                carrier="solar",
-                p_max_pu=1.0)
-    
-    # Aalborg: Gas generator
-    network.add("Generator", "gas_Aalborg",
-                bus="Aalborg",
-                p_nom=capacity_gas,
-                marginal_cost=cost_gas,
-                carrier="gas",
-                p_max_pu=1.0)
-    
-    # Add loads at each bus (load provided in MW)
-    network.add("Load", "load_Copenhagen",
-                bus="Copenhagen",
-                p_set=demand_Copenhagen)
-    network.add("Load", "load_Aarhus",
-                bus="Aarhus",
-                p_set=demand_Aarhus)
-    network.add("Load", "load_Aalborg",
-                bus="Aalborg",
-                p_set=demand_Aalborg)
-    
-    # Define transmission lines connecting the nodes (using a simplified impedance factor)
-    lines = [
-        ("Copenhagen", "Aarhus", 150),  # (from, to, length in km)
-        ("Aarhus", "Aalborg", 100),
-        ("Aalborg", "Copenhagen", 200)
-    ]
-    
-    for bus1, bus2, length in lines:
-        network.add("Line", f"{bus1}_{bus2}",
-                    bus0=bus1,
-                    bus1=bus2,
-                    x=length * 0.01,
-                    s_nom=100)
-    
-    # Solve the linear optimal power flow problem.
-    # network.optimize(network.snapshots,)
-    network.optimize(solver_name="glpk")
+    # Single-scenario entry point used by the Shiny app: a one-row batch
+    params = pd.DataFrame([{
+        "demand_Copenhagen": demand_Copenhagen,
+        "demand_Aarhus": demand_Aarhus,
+        "demand_Aalborg": demand_Aalborg,
+        "capacity_wind": capacity_wind, "cost_wind": cost_wind,
+        "capacity_solar": capacity_solar, "cost_solar": cost_solar,
+        "capacity_gas": capacity_gas, "cost_gas": cost_gas
+    }])
+    generators_p, lines_p0 = run_pypsa_model_batch(params)
     
-    # Retrieve results: generator outputs and line flows.
+    # Retrieve results: generator outputs and line flows as arrays, ordered like
+    # the GEN_NAMES / LINE_NAMES tuples returned alongside them.
     results = {}
-    results["generators"] = network.generators_t.p.iloc[0].to_dict()
-    results["lines"] = network.lines_t.p0.iloc[0].to_dict()
-    results["buses"] = buses
+    results["generators"] = generators_p.to_numpy()[0]
+    results["generator_names"] = GEN_NAMES
+    results["lines"] = lines_p0.to_numpy()[0]
+    results["line_names"] = LINE_NAMES
+    results["buses"] = BUSES
     return results
 
 # # For testing the module independently.